@@ -1,9 +1,15 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
 from config import Config
+import click
+from sqlalchemy import text
 from sqlalchemy.orm import joinedload
-from models import DatabaseManager, ModelFactory, Client, Vehicle, Service, Part, ServicePart
+from models import DatabaseManager, ModelFactory, Client, Vehicle, Service, Part, ServicePart, Bay, Appointment
+from validators import validate, validate_many
+import uniqueness
+import changefeed
+from scheduling import Scheduler, SchedulingError
+from kpis import KPICache
 import datetime
-import re
 
 app = Flask(__name__)
 @app.errorhandler(Exception)
@@ -13,7 +19,26 @@ def handle_exception(e):
 app.config.from_object(Config)
 
 # Inicializa o gerenciador de banco de dados (Singleton)
-db_manager = DatabaseManager(app.config["SQLALCHEMY_DATABASE_URI"])
+db_manager = DatabaseManager(app.config["SQLALCHEMY_DATABASE_URI"], app.config["DB_POOL_SIZE"])
+db_manager.create_all()
+
+# Feed de alterações (change_log) alimentado pelos flushes
+changefeed.install(db_manager)
+
+# Agenda dos boxes
+scheduler = Scheduler(db_manager, app.config["SHOP_OPEN_HOUR"], app.config["SHOP_CLOSE_HOUR"])
+scheduler.ensure_bays(app.config["SHOP_BAYS"])
+
+# Indicadores do dashboard (cache invalidado nas gravações)
+kpi_cache = KPICache(db_manager, app.config["KPI_CACHE_TTL"], app.config["LOW_STOCK_THRESHOLD"])
+kpi_cache.install()
+
+
+def flash_errors(errors):
+    """Exibe as mensagens de erro retornadas pelo validador."""
+    for message in errors.values():
+        flash(message, 'danger')
+
 
 # ===================================
 # ROTAS
@@ -22,7 +47,39 @@ db_manager = DatabaseManager(app.config["SQLALCHEMY_DATABASE_URI"])
 # Página inicial
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', kpis=kpi_cache.get())
+
+
+@app.route('/api/dashboard')
+def dashboard():
+    """Indicadores em JSON para os terminais do balcão (servidos do cache)."""
+    response = jsonify(kpi_cache.get())
+    response.cache_control.max_age = 5
+    return response
+
+
+# -------------------
+# Saúde do serviço
+# -------------------
+@app.route('/healthz')
+def healthz():
+    """Liveness: o processo responde (não toca no banco)."""
+    return jsonify({"status": "ok"})
+
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: o banco aceita consultas."""
+    session = db_manager.get_session()
+    try:
+        session.execute(text('SELECT 1'))
+        return jsonify({"status": "ready"})
+    except Exception:
+        # detalhe só no log: a resposta é pública
+        app.logger.exception('Banco indisponível')
+        return jsonify({"status": "unavailable"}), 503
+    finally:
+        session.close()
 
 
 # -------------------
@@ -41,14 +98,19 @@ def clients():
 @app.route('/client/new', methods=['GET', 'POST'])
 def new_client():
     if request.method == 'POST':
-        name = request.form['name']
-        address = request.form['address']
-        phone = request.form['phone']
-        email = request.form['email']
+        data, errors = validate('Client', request.form)
+        if errors:
+            flash_errors(errors)
+            return render_template('new_client.html')
 
         session = db_manager.get_session()
         try:
-            client = ModelFactory.create_model('Client', name=name, address=address, phone=phone, email=email)
+            errors = uniqueness.check('Client', data, session)
+            if errors:
+                flash_errors(errors)
+                return render_template('new_client.html')
+
+            client = ModelFactory.create_model('Client', **data)
             session.add(client)
             session.commit()
             flash('Cliente adicionado com sucesso', 'success')
@@ -64,6 +126,12 @@ def new_client():
 
 @app.route('/client/edit/<int:client_id>', methods=['GET', 'POST'])
 def edit_client(client_id):
+    data, errors = {}, {}
+    if request.method == 'POST':
+        data, errors = validate('Client', request.form)
+        if errors:
+            flash_errors(errors)
+
     session = db_manager.get_session()
     try:
         client = session.get(Client, client_id)
@@ -71,14 +139,16 @@ def edit_client(client_id):
             flash('Cliente não encontrado!', 'danger')
             return redirect(url_for('clients'))
 
-        if request.method == 'POST':
-            client.name = request.form['name']
-            client.address = request.form['address']
-            client.phone = request.form['phone']
-            client.email = request.form['email']
-            session.commit()
-            flash('Cliente atualizado com sucesso', 'success')
-            return redirect(url_for('clients'))
+        if request.method == 'POST' and not errors:
+            errors = uniqueness.check('Client', data, session, exclude_id=client.id)
+            flash_errors(errors)
+
+            if not errors:
+                for field, value in data.items():
+                    setattr(client, field, value)
+                session.commit()
+                flash('Cliente atualizado com sucesso', 'success')
+                return redirect(url_for('clients'))
 
         return render_template('edit_client.html', client=client)
     except Exception as e:
@@ -125,34 +195,24 @@ def vehicles():
 
 @app.route('/vehicle/new', methods=['GET', 'POST'])
 def new_vehicle():
+    data, errors = {}, {}
+    if request.method == 'POST':
+        data, errors = validate('Vehicle', request.form)
+        if errors:
+            flash_errors(errors)
+
     session = db_manager.get_session()
     try:
-        if request.method == 'POST':
-            make = request.form['make']
-            model = request.form['model']
-            year_str = request.form['year']
-            license_plate = request.form['license_plate']
-
-            # Validação do ano
-            if not year_str.isdigit() or len(year_str) > 4:
-                flash('O campo Ano deve conter apenas números e ter no máximo 4 dígitos.', 'danger')
-                clients = session.query(Client).all()
-                return render_template('new_vehicle.html', clients=clients)
-            year = int(year_str)
-
-            # Validação da placa
-            if len(license_plate) > 7 or not re.match(r'^[A-Z0-9]+$', license_plate):
-                flash('O campo Placa deve ter no máximo 7 caracteres, contendo apenas letras maiúsculas e números.', 'danger')
-                clients = session.query(Client).all()
-                return render_template('new_vehicle.html', clients=clients)
-
-            client_id = int(request.form['client_id'])
-            vehicle = ModelFactory.create_model('Vehicle', make=make, model=model, year=year,
-                                                license_plate=license_plate, client_id=client_id)
-            session.add(vehicle)
-            session.commit()
-            flash('Veículo adicionado com sucesso', 'success')
-            return redirect(url_for('vehicles'))
+        if request.method == 'POST' and not errors:
+            errors = uniqueness.check('Vehicle', data, session)
+            flash_errors(errors)
+
+            if not errors:
+                vehicle = ModelFactory.create_model('Vehicle', **data)
+                session.add(vehicle)
+                session.commit()
+                flash('Veículo adicionado com sucesso', 'success')
+                return redirect(url_for('vehicles'))
 
         clients = session.query(Client).all()
         return render_template('new_vehicle.html', clients=clients)
@@ -166,6 +226,12 @@ def new_vehicle():
 
 @app.route('/vehicle/edit/<int:vehicle_id>', methods=['GET', 'POST'])
 def edit_vehicle(vehicle_id):
+    data, errors = {}, {}
+    if request.method == 'POST':
+        data, errors = validate('Vehicle', request.form)
+        if errors:
+            flash_errors(errors)
+
     session = db_manager.get_session()
     try:
         vehicle = session.get(Vehicle, vehicle_id)
@@ -173,30 +239,16 @@ def edit_vehicle(vehicle_id):
             flash('Veículo não encontrado!', 'danger')
             return redirect(url_for('vehicles'))
 
-        if request.method == 'POST':
-            vehicle.make = request.form['make']
-            vehicle.model = request.form['model']
-            year_str = request.form['year']
-            license_plate = request.form['license_plate']
-            vehicle.client_id = int(request.form['client_id'])
-
-            # Validação do ano
-            if not year_str.isdigit() or len(year_str) > 4:
-                flash('O campo Ano deve conter apenas números e ter no máximo 4 dígitos.', 'danger')
-                clients = session.query(Client).all()
-                return render_template('edit_vehicle.html', vehicle=vehicle, clients=clients)
-            vehicle.year = int(year_str)
-
-            # Validação da placa
-            if len(license_plate) > 7 or not re.match(r'^[A-Z0-9]+$', license_plate):
-                flash('O campo Placa deve ter no máximo 7 caracteres, contendo apenas letras maiúsculas e números.', 'danger')
-                clients = session.query(Client).all()
-                return render_template('edit_vehicle.html', vehicle=vehicle, clients=clients)
-            vehicle.license_plate = license_plate
+        if request.method == 'POST' and not errors:
+            errors = uniqueness.check('Vehicle', data, session, exclude_id=vehicle.id)
+            flash_errors(errors)
 
-            session.commit()
-            flash('Veículo atualizado com sucesso', 'success')
-            return redirect(url_for('vehicles'))
+            if not errors:
+                for field, value in data.items():
+                    setattr(vehicle, field, value)
+                session.commit()
+                flash('Veículo atualizado com sucesso', 'success')
+                return redirect(url_for('vehicles'))
 
         clients = session.query(Client).all()
         return render_template('edit_vehicle.html', vehicle=vehicle, clients=clients)
@@ -244,32 +296,16 @@ def services():
 
 @app.route('/service/new', methods=['GET', 'POST'])
 def new_service():
+    data, errors = {}, {}
+    if request.method == 'POST':
+        data, errors = validate('Service', request.form)
+        if errors:
+            flash_errors(errors)
+
     session = db_manager.get_session()
     try:
-        if request.method == 'POST':
-            description = request.form['description']
-            cost_str = request.form['cost']
-            vehicle_id = int(request.form['vehicle_id'])
-
-            # Validação
-            if len(description) > 400:
-                flash('Descrição deve ter no máximo 400 caracteres.', 'danger')
-                vehicles = session.query(Vehicle).all()
-                return render_template('new_service.html', vehicles=vehicles)
-
-            try:
-                cost = float(cost_str)
-                if len(str(int(cost))) > 6:
-                    flash('Custo deve ter no máximo 6 dígitos.', 'danger')
-                    vehicles = session.query(Vehicle).all()
-                    return render_template('new_service.html', vehicles=vehicles)
-            except ValueError:
-                flash('Custo deve ser numérico.', 'danger')
-                vehicles = session.query(Vehicle).all()
-                return render_template('new_service.html', vehicles=vehicles)
-
-            service = ModelFactory.create_model('Service', description=description, cost=cost,
-                                                vehicle_id=vehicle_id, date=datetime.datetime.now())
+        if request.method == 'POST' and not errors:
+            service = ModelFactory.create_model('Service', date=datetime.datetime.now(), **data)
             session.add(service)
             session.commit()
             flash('Serviço adicionado com sucesso', 'success')
@@ -300,14 +336,21 @@ def parts():
 
 @app.route('/part/new', methods=['GET', 'POST'])
 def new_part():
+    if request.method == 'POST':
+        data, errors = validate('Part', request.form)
+        if errors:
+            flash_errors(errors)
+            return render_template('new_part.html')
+
     session = db_manager.get_session()
     try:
         if request.method == 'POST':
-            name = request.form['name']
-            price = float(request.form['price'])
-            stock = int(request.form['stock'])
+            errors = uniqueness.check('Part', data, session)
+            if errors:
+                flash_errors(errors)
+                return render_template('new_part.html')
 
-            part = ModelFactory.create_model('Part', name=name, price=price, stock=stock)
+            part = ModelFactory.create_model('Part', **data)
             session.add(part)
             session.commit()
             flash('Peça adicionada com sucesso', 'success')
@@ -324,6 +367,12 @@ def new_part():
 
 @app.route('/part/edit/<int:part_id>', methods=['GET', 'POST'])
 def edit_part(part_id):
+    data, errors = {}, {}
+    if request.method == 'POST':
+        data, errors = validate('Part', request.form)
+        if errors:
+            flash_errors(errors)
+
     session = db_manager.get_session()
     try:
         part = session.get(Part, part_id)
@@ -331,13 +380,16 @@ def edit_part(part_id):
             flash('Peça não encontrada!', 'danger')
             return redirect(url_for('parts'))
 
-        if request.method == 'POST':
-            part.name = request.form['name']
-            part.price = float(request.form['price'])
-            part.stock = int(request.form['stock'])
-            session.commit()
-            flash('Peça atualizada com sucesso', 'success')
-            return redirect(url_for('parts'))
+        if request.method == 'POST' and not errors:
+            errors = uniqueness.check('Part', data, session, exclude_id=part.id)
+            flash_errors(errors)
+
+            if not errors:
+                for field, value in data.items():
+                    setattr(part, field, value)
+                session.commit()
+                flash('Peça atualizada com sucesso', 'success')
+                return redirect(url_for('parts'))
 
         return render_template('edit_part.html', part=part)
     except Exception as e:
@@ -368,6 +420,8 @@ def delete_part(part_id=None):
             flash('Peça não encontrada!', 'danger')
             return redirect(url_for('parts'))
 
+        links = session.query(ServicePart).filter(ServicePart.part_id == part_id).all()
+        changefeed.record(session, links, 'delete')
         session.query(ServicePart).filter(ServicePart.part_id == part_id).delete(synchronize_session=False)
         session.delete(part)
         session.commit()
@@ -388,15 +442,210 @@ def delete_part_missing_id():
     return redirect(url_for('parts'))
 
 
+# -------------------
+# Agenda
+# -------------------
+@app.route('/appointments')
+def appointments():
+    session = db_manager.get_session()
+    try:
+        all_appointments = (session.query(Appointment)
+                            .options(joinedload(Appointment.vehicle), joinedload(Appointment.bay))
+                            .order_by(Appointment.starts_at.desc())
+                            .all())
+        return render_template('appointments.html', appointments=all_appointments)
+    finally:
+        session.close()
+
+
+@app.route('/appointment/new', methods=['GET', 'POST'])
+def new_appointment():
+    if request.method == 'POST':
+        data, errors = validate('Appointment', request.form)
+        if errors:
+            flash_errors(errors)
+        else:
+            try:
+                scheduler.book(**data)
+                flash('Agendamento criado com sucesso', 'success')
+                return redirect(url_for('appointments'))
+            except SchedulingError as e:
+                flash(str(e), 'danger')
+
+    session = db_manager.get_session()
+    try:
+        vehicles = session.query(Vehicle).all()
+        bays = session.query(Bay).order_by(Bay.id).all()
+        return render_template('new_appointment.html', vehicles=vehicles, bays=bays)
+    finally:
+        session.close()
+
+
+@app.route('/appointment/complete/<int:appointment_id>', methods=['POST'])
+def complete_appointment(appointment_id):
+    try:
+        scheduler.complete(appointment_id)
+        flash('Agendamento concluído com sucesso', 'success')
+        return redirect(url_for('services'))
+    except SchedulingError as e:
+        flash(str(e), 'danger')
+    except Exception as e:
+        app.logger.exception(f'Erro ao concluir agendamento {appointment_id}')
+        flash(f'Erro ao concluir agendamento: {str(e)}', 'danger')
+    return redirect(url_for('appointments'))
+
+
+@app.route('/appointment/cancel/<int:appointment_id>', methods=['POST'])
+def cancel_appointment(appointment_id):
+    try:
+        scheduler.cancel(appointment_id)
+        flash('Agendamento cancelado com sucesso', 'success')
+    except SchedulingError as e:
+        flash(str(e), 'danger')
+    return redirect(url_for('appointments'))
+
+
+@app.route('/api/schedule/next-slot')
+def next_slot():
+    """Próximo horário livre: ?duration=<minutos>[&bay_id=<id>][&after=<ISO>]."""
+    duration = request.args.get('duration', 60, type=int)
+    bay_id = request.args.get('bay_id', type=int)
+    after = request.args.get('after')
+    try:
+        after = datetime.datetime.fromisoformat(after) if after else None
+        if duration <= 0:
+            raise SchedulingError('Duração deve ser positiva.')
+        chosen, starts_at = scheduler.next_free_slot(duration, after, bay_id)
+    except ValueError as e:  # inclui SchedulingError
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "bay_id": chosen,
+        "starts_at": starts_at.isoformat(),
+        "ends_at": (starts_at + datetime.timedelta(minutes=duration)).isoformat(),
+    })
+
+
+# -------------------
+# Importação em lote
+# -------------------
+@app.route('/api/import/<model_name>', methods=['POST'])
+def bulk_import(model_name):
+    """
+    Recebe uma lista JSON de registros de Client, Vehicle ou Part.
+    Valida o lote, verifica chaves únicas em poucas consultas e grava os
+    válidos. Veículos e peças usam upsert pela placa / nome quando o
+    índice único existe no banco.
+    """
+    if model_name not in ('Client', 'Vehicle', 'Part'):
+        return jsonify({"error": f"Modelo inválido: {model_name}"}), 404
+
+    records = request.get_json(silent=True)
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        return jsonify({"error": "O corpo deve ser uma lista JSON de objetos."}), 400
+
+    # Validação antes de abrir qualquer sessão
+    valid, invalid = validate_many(model_name, records)
+    rejected = {e["index"] for e in invalid}
+    valid_indexes = [i for i in range(len(records)) if i not in rejected]
+
+    session = db_manager.get_session()
+    try:
+        upsert = uniqueness.can_upsert(model_name, session)
+        if model_name in uniqueness.UPSERT_KEYS and not upsert:
+            app.logger.warning(f'Índice único ausente em {model_name}: importação sem upsert')
+
+        # Com upsert, o que já está no banco vira atualização e só as
+        # duplicatas dentro do lote são rejeitadas
+        conflicts = uniqueness.find_conflicts(model_name, valid, session, check_existing=not upsert)
+        missing = uniqueness.find_missing_references(model_name, valid, session)
+        accepted = []
+        for index, record, errors, missing_errors in zip(valid_indexes, valid, conflicts, missing):
+            errors.update(missing_errors)
+            if errors:
+                invalid.append({"index": index, "errors": errors})
+            else:
+                accepted.append(record)
+
+        if upsert:
+            key = uniqueness.UPSERT_KEYS[model_name]
+            keys = [r[key] for r in accepted]
+            model = ModelFactory.get_class(model_name)
+            before = changefeed.snapshot_keys(session, model, key, keys)
+            imported = uniqueness.upsert_many(model_name, accepted, session)
+            # O upsert é Core e não dispara o flush: registra no feed aqui
+            changefeed.record_keys(session, model, key, keys, before)
+        else:
+            # add_all (e não bulk_insert_mappings) para o feed de alterações ver o flush
+            session.add_all([ModelFactory.create_model(model_name, **r) for r in accepted])
+            imported = len(accepted)
+
+        session.commit()
+        # O upsert em Core não passa pelo flush que invalida o dashboard
+        kpi_cache.invalidate()
+        invalid.sort(key=lambda e: e["index"])
+        return jsonify({"imported": imported, "errors": invalid})
+    except Exception:
+        session.rollback()
+        app.logger.exception(f'Erro na importação de {model_name}')
+        return jsonify({"error": "Erro interno na importação. Nenhum registro foi gravado."}), 500
+    finally:
+        session.close()
+
+
+# -------------------
+# Feed de alterações
+# -------------------
+@app.route('/api/changes')
+def changes():
+    """
+    Entradas do change_log após o cursor `since`, em lotes de até
+    `limit`. O consumidor repete com since=next enquanto has_more.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = min(max(request.args.get('limit', 500, type=int), 1), 1000)
+
+    session = db_manager.get_session()
+    try:
+        entries, next_cursor, has_more = changefeed.read_changes(session, since, limit)
+        return jsonify({"changes": entries, "next": next_cursor, "has_more": has_more})
+    finally:
+        session.close()
+
+
+@app.cli.command('compact-changes')
+@click.option('--days', default=30, show_default=True,
+              help='Compacta apenas entradas mais antigas que N dias.')
+def compact_changes(days):
+    """Remove do change_log as entradas antigas já substituídas."""
+    session = db_manager.get_session()
+    try:
+        removed = changefeed.compact(session, days)
+        session.commit()
+        click.echo(f'{removed} entradas removidas do change_log.')
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
 # ===================================
 # EXECUÇÃO DO FLASK
 # ===================================
-# Nenhum app.run() aqui, use "flask run"
+# Nenhum app.run() aqui: use "flask run" em desenvolvimento e
+# "gunicorn -c gunicorn.conf.py wsgi:app" em produção
 
 
 
 @app.route('/service/edit/<int:service_id>', methods=['GET', 'POST'])
 def edit_service(service_id):
+    data, errors = {}, {}
+    if request.method == 'POST':
+        data, errors = validate('Service', request.form)
+        if errors:
+            flash_errors(errors)
+
     session = db_manager.get_session()
     try:
         service = session.get(Service, service_id)
@@ -404,30 +653,9 @@ def edit_service(service_id):
             flash('Serviço não encontrado!', 'danger')
             return redirect(url_for('services'))
 
-        if request.method == 'POST':
-            description = request.form['description']
-            cost_str = request.form['cost']
-            vehicle_id = int(request.form['vehicle_id'])
-
-            if len(description) > 400:
-                flash('Descrição deve ter no máximo 400 caracteres.', 'danger')
-                vehicles = session.query(Vehicle).all()
-                return render_template('edit_service.html', service=service, vehicles=vehicles)
-
-            try:
-                cost = float(cost_str)
-                if len(str(int(cost))) > 6:
-                    flash('Custo deve ter no máximo 6 dígitos.', 'danger')
-                    vehicles = session.query(Vehicle).all()
-                    return render_template('edit_service.html', service=service, vehicles=vehicles)
-            except ValueError:
-                flash('Custo deve ser numérico.', 'danger')
-                vehicles = session.query(Vehicle).all()
-                return render_template('edit_service.html', service=service, vehicles=vehicles)
-
-            service.description = description
-            service.cost = cost
-            service.vehicle_id = vehicle_id
+        if request.method == 'POST' and not errors:
+            for field, value in data.items():
+                setattr(service, field, value)
             session.commit()
 
             flash('Serviço atualizado com sucesso!', 'success')
@@ -0,0 +1,99 @@
+"""
+Benchmark local de vazão: compara "flask run" com o gunicorn.
+
+    python bench.py --duration 10 --concurrency 32
+
+Sobe cada servidor em uma porta, espera o /readyz e dispara requisições
+GET concorrentes nas rotas informadas durante --duration segundos.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+SERVERS = {
+    'flask run': [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', '{port}'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                 '--bind', '127.0.0.1:{port}', 'wsgi:app'],
+}
+
+
+def wait_ready(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/readyz', timeout=1) as resp:
+                if resp.status == 200:
+                    return True
+        except OSError:  # URLError, ConnectionError e timeouts
+            time.sleep(0.2)
+    return False
+
+
+def run_load(base_url, paths, duration, concurrency):
+    """Retorna (requisições ok, erros) no intervalo."""
+    counts = {"ok": 0, "error": 0}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(offset):
+        ok = error = 0
+        i = offset
+        while time.monotonic() < stop_at:
+            url = base_url + paths[i % len(paths)]
+            i += 1
+            try:
+                with urllib.request.urlopen(url, timeout=10) as resp:
+                    resp.read()
+                ok += 1
+            except OSError:  # URLError, ConnectionError e timeouts (inclusive no read)
+                error += 1
+        with lock:
+            counts["ok"] += ok
+            counts["error"] += error
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts["ok"], counts["error"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--paths', nargs='+', default=['/clients', '/vehicles', '/services', '/parts'])
+    parser.add_argument('--servers', nargs='+', default=list(SERVERS), choices=list(SERVERS))
+    args = parser.parse_args()
+
+    results = {}
+    for offset, name in enumerate(args.servers):
+        port = args.port + offset
+        cmd = [part.format(port=port) for part in SERVERS[name]]
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        base_url = f'http://127.0.0.1:{port}'
+        try:
+            if not wait_ready(base_url):
+                print(f'{name}: servidor não ficou pronto')
+                continue
+            ok, error = run_load(base_url, args.paths, args.duration, args.concurrency)
+            results[name] = ok / args.duration
+            print(f'{name}: {results[name]:.1f} req/s ({ok} ok, {error} erros)')
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    if len(results) == 2:
+        print(f"gunicorn / flask run: {results['gunicorn'] / results['flask run']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
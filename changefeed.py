@@ -0,0 +1,189 @@
+import datetime
+import json
+
+from sqlalchemy import event, func, inspect, text
+
+from models import ChangeLog, Client, Vehicle, Service, Part, ServicePart, Bay, Appointment
+
+
+# ============================================================
+#  FEED DE ALTERAÇÕES
+# ============================================================
+#  Cada flush grava em change_log uma linha por entidade inserida,
+#  alterada ou excluída. Consumidores (contabilidade, lembretes por SMS)
+#  leem a partir do último cursor em vez de reler o banco inteiro.
+#  Escritas em Core / bulk não passam pelo flush: use record() ou
+#  record_keys().
+#
+#  O cursor é o id autoincremento. Para que ele nunca "pule" uma entrada
+#  cujo commit chega depois de uma de id maior, as transações que gravam
+#  no feed precisam ser serializadas: o SQLite já tem um único escritor;
+#  no PostgreSQL cada transação pega um advisory lock antes de gravar
+#  (_serialize_writers), liberado no commit/rollback.
+
+TRACKED = (Client, Vehicle, Service, Part, ServicePart, Bay, Appointment)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+# Chave arbitrária do advisory lock do feed no PostgreSQL
+FEED_LOCK_KEY = 7012029
+
+
+def _row(mapper, data, operation, changed=None):
+    entity_id = ':'.join(str(data[col.key]) for col in mapper.primary_key)
+    return {
+        "entity": mapper.class_.__name__,
+        "entity_id": entity_id,
+        "operation": operation,
+        "data": json.dumps(data, default=_json_default),
+        "changed": json.dumps(changed) if changed else None,
+        "created_at": datetime.datetime.utcnow(),
+    }
+
+
+def _entry(obj, operation, changed=None):
+    state = inspect(obj)
+    mapper = state.mapper
+    # state.dict evita recarregar atributos expirados durante o flush
+    data = {attr.key: state.dict.get(attr.key) for attr in mapper.column_attrs}
+    return _row(mapper, data, operation, changed)
+
+
+def _serialize_writers(session):
+    connection = session.connection()
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {"key": FEED_LOCK_KEY})
+    return connection
+
+
+def _insert(session, rows):
+    if rows:
+        _serialize_writers(session).execute(ChangeLog.__table__.insert(), rows)
+
+
+def _changed_columns(obj):
+    state = inspect(obj)
+    return [attr.key for attr in state.mapper.column_attrs
+            if state.attrs[attr.key].history.has_changes()]
+
+
+def record(session, objects, operation):
+    """Grava no feed as entidades informadas (escritas fora do flush)."""
+    _insert(session, [_entry(obj, operation) for obj in objects if isinstance(obj, TRACKED)])
+
+
+def snapshot_keys(session, model, key, values, chunk_size=500):
+    """
+    Estado atual das linhas de `model` cujo campo `key` está em values,
+    como {valor_da_chave: {coluna: valor}}. Consulta só colunas, sem
+    passar pelo identity map da sessão.
+    """
+    mapper = inspect(model)
+    names = [attr.key for attr in mapper.column_attrs]
+    columns = [getattr(model, name) for name in names]
+    column = getattr(model, key)
+    values = list(values)
+    found = {}
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        for row in session.query(*columns).filter(column.in_(chunk)):
+            data = dict(zip(names, row))
+            found[data[key]] = data
+    return found
+
+
+def record_keys(session, model, key, values, before):
+    """
+    Grava no feed o resultado de uma escrita em Core (ex.: upsert) nas
+    linhas com `key` em values. `before` é o snapshot_keys() tirado antes
+    da escrita: linhas novas entram como insert, as existentes como
+    update com os campos alterados, e as que não mudaram são ignoradas.
+    """
+    mapper = inspect(model)
+    rows = []
+    for value, data in snapshot_keys(session, model, key, values).items():
+        previous = before.get(value)
+        if previous is None:
+            rows.append(_row(mapper, data, 'insert'))
+            continue
+        changed = [name for name in data if data[name] != previous[name]]
+        if changed:
+            rows.append(_row(mapper, data, 'update', changed))
+    _insert(session, rows)
+
+
+def _after_flush(session, flush_context):
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, TRACKED):
+            rows.append(_entry(obj, 'insert'))
+    for obj in session.dirty:
+        if isinstance(obj, TRACKED):
+            changed = _changed_columns(obj)
+            if changed:
+                rows.append(_entry(obj, 'update', changed))
+    for obj in session.deleted:
+        if isinstance(obj, TRACKED):
+            rows.append(_entry(obj, 'delete'))
+
+    # Um único executemany na mesma transação do flush
+    _insert(session, rows)
+
+
+def install(db_manager):
+    """Liga o feed às sessões criadas pelo DatabaseManager."""
+    if not event.contains(db_manager.Session, 'after_flush', _after_flush):
+        event.listen(db_manager.Session, 'after_flush', _after_flush)
+
+
+# ============================================================
+#  LEITURA E COMPACTAÇÃO
+# ============================================================
+
+def read_changes(session, since=0, limit=500):
+    """
+    Retorna (entradas, próximo_cursor, tem_mais) com até `limit`
+    entradas de id > since, em ordem de gravação. A ordem dos ids é a
+    ordem dos commits (ver _serialize_writers), então um consumidor que
+    guarda o último cursor não perde entradas.
+    """
+    rows = (session.query(ChangeLog)
+            .filter(ChangeLog.id > since)
+            .order_by(ChangeLog.id)
+            .limit(limit + 1)
+            .all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    entries = [{
+        "cursor": row.id,
+        "entity": row.entity,
+        "entity_id": row.entity_id,
+        "operation": row.operation,
+        "data": json.loads(row.data) if row.data else None,
+        "changed": json.loads(row.changed) if row.changed else None,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    } for row in rows]
+
+    next_cursor = rows[-1].id if rows else since
+    return entries, next_cursor, has_more
+
+
+def compact(session, older_than_days=30):
+    """
+    Remove entradas antigas que já foram substituídas por uma mais nova
+    da mesma entidade. Como cada entrada traz o estado completo da
+    linha, a última por entidade basta para um consumidor atrasado.
+    Não faz commit. Retorna o número de entradas removidas.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=older_than_days)
+    latest = (session.query(func.max(ChangeLog.id))
+              .group_by(ChangeLog.entity, ChangeLog.entity_id))
+    return (session.query(ChangeLog)
+            .filter(ChangeLog.created_at < cutoff, ChangeLog.id.notin_(latest))
+            .delete(synchronize_session=False))
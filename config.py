@@ -13,3 +13,19 @@ class Config:
     )
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # removido no Flask-SQLAlchemy 3, mas manter não causa problema
+
+    # Agenda: quantidade de boxes e horário de funcionamento
+    SHOP_BAYS = int(os.environ.get("SHOP_BAYS", 3))
+    SHOP_OPEN_HOUR = int(os.environ.get("SHOP_OPEN_HOUR", 8))
+    SHOP_CLOSE_HOUR = int(os.environ.get("SHOP_CLOSE_HOUR", 18))
+
+    # Dashboard: validade do cache de indicadores (s) e limite de estoque baixo
+    KPI_CACHE_TTL = int(os.environ.get("KPI_CACHE_TTL", 30))
+    LOW_STOCK_THRESHOLD = int(os.environ.get("LOW_STOCK_THRESHOLD", 5))
+
+    # Servidor de produção (gunicorn.conf.py)
+    WEB_WORKERS = int(os.environ.get("WEB_WORKERS", min(2 * os.cpu_count() + 1, 8)))
+    WEB_THREADS = int(os.environ.get("WEB_THREADS", 4))
+
+    # Uma conexão por thread do worker
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", WEB_THREADS))
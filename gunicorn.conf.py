@@ -0,0 +1,37 @@
+"""
+Configuração do gunicorn para produção.
+
+Workers com threads (gthread): cada worker mantém um pool de
+DB_POOL_SIZE conexões, uma por thread. Com SQLite em modo WAL as
+leituras rodam em paralelo e as escritas esperam o lock (timeout de 30s).
+"""
+
+import os
+
+from config import Config
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+worker_class = "gthread"
+
+# Carrega a aplicação uma vez no master e faz fork dos workers
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# Recicla workers periodicamente para conter vazamentos de memória
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # As conexões abertas no master (create_all) não podem ser
+    # compartilhadas entre processos
+    from app import db_manager
+    db_manager.dispose()
@@ -1,4 +1,4 @@
-from models import Base, DatabaseManager, Client, Vehicle, Service, Part
+from models import DatabaseManager, Client, Vehicle, Service, Part
 import datetime
 
 def init_db():
@@ -8,8 +8,8 @@ def init_db():
     # Criar instância do DatabaseManager (Singleton)
     db_manager = DatabaseManager()
     
-    # Criar todas as tabelas
-    Base.metadata.create_all(db_manager.engine)
+    # Criar todas as tabelas (e índices novos em tabelas existentes)
+    db_manager.create_all()
     
     # Obter uma sessão
     session = db_manager.get_session()
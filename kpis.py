@@ -0,0 +1,157 @@
+import datetime
+import logging
+import threading
+import time
+
+from sqlalchemy import event, func
+
+from models import Appointment, Bay, Client, Part, Service, Vehicle
+
+
+# ============================================================
+#  CACHE DE INDICADORES (DASHBOARD)
+# ============================================================
+#  Os indicadores saem de poucas consultas agregadas e ficam em memória.
+#  Uma gravação (commit) invalida o cache do processo; escritas em Core
+#  (ex.: upsert da importação) chamam invalidate() após o commit. O TTL
+#  limita o atraso em relação às gravações feitas por outros workers. Com o cache
+#  vencido, uma única thread recalcula em segundo plano enquanto as
+#  demais requisições continuam recebendo o último valor.
+
+WATCHED = (Client, Vehicle, Service, Part, Appointment)
+
+logger = logging.getLogger(__name__)
+
+
+class KPICache:
+    def __init__(self, db_manager, ttl=30, low_stock_threshold=5, top_clients=5):
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self.low_stock_threshold = low_stock_threshold
+        self.top_clients = top_clients
+        self._snapshot = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    # -------------------
+    # Invalidação
+    # -------------------
+    def invalidate(self):
+        self._expires_at = 0
+
+    def _after_flush(self, session, flush_context):
+        if any(isinstance(obj, WATCHED)
+               for objects in (session.new, session.dirty, session.deleted)
+               for obj in objects):
+            session.info['kpi_dirty'] = True
+
+    def _after_commit(self, session):
+        if session.info.pop('kpi_dirty', False):
+            self.invalidate()
+
+    def install(self):
+        """Invalida o cache a cada commit que altera as entidades do dashboard."""
+        event.listen(self.db_manager.Session, 'after_flush', self._after_flush)
+        event.listen(self.db_manager.Session, 'after_commit', self._after_commit)
+
+    # -------------------
+    # Leitura
+    # -------------------
+    def get(self):
+        """Retorna o último snapshot (dict pronto para JSON)."""
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._refresh()
+            return self._snapshot
+
+        if time.monotonic() >= self._expires_at and self._lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh_and_release, daemon=True).start()
+        return self._snapshot
+
+    def _refresh_and_release(self):
+        try:
+            self._refresh()
+        except Exception:
+            # mantém o snapshot anterior; nova tentativa após o TTL
+            logger.exception('Erro ao recalcular os indicadores')
+        finally:
+            self._lock.release()
+
+    def _refresh(self):
+        # marca antes de consultar: um commit durante o cálculo invalida de novo
+        self._expires_at = time.monotonic() + self.ttl
+        session = self.db_manager.get_session()
+        try:
+            self._snapshot = self._compute(session)
+        finally:
+            session.close()
+
+    # -------------------
+    # Consultas agregadas
+    # -------------------
+    def _compute(self, session):
+        now = datetime.datetime.now()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow = today + datetime.timedelta(days=1)
+        month_start = today.replace(day=1)
+
+        services_today = (session.query(func.count(Service.id))
+                          .filter(Service.date >= today, Service.date < tomorrow)
+                          .scalar())
+
+        revenue_month, services_month = (session.query(func.coalesce(func.sum(Service.cost), 0),
+                                                       func.count(Service.id))
+                                         .filter(Service.date >= month_start)
+                                         .one())
+
+        appointments_today = (session.query(Appointment.starts_at, Appointment.ends_at,
+                                            Appointment.status, Appointment.description,
+                                            Vehicle.license_plate, Bay.name)
+                              .join(Vehicle, Appointment.vehicle_id == Vehicle.id)
+                              .join(Bay, Appointment.bay_id == Bay.id)
+                              .filter(Appointment.starts_at >= today,
+                                      Appointment.starts_at < tomorrow,
+                                      Appointment.status != 'cancelled')
+                              .order_by(Appointment.starts_at)
+                              .all())
+
+        low_stock = (session.query(Part.id, Part.name, Part.stock)
+                     .filter(Part.stock <= self.low_stock_threshold)
+                     .order_by(Part.stock, Part.name)
+                     .limit(10)
+                     .all())
+
+        year_ago = today - datetime.timedelta(days=365)
+        total = func.sum(Service.cost)
+        top_clients = (session.query(Client.id, Client.name, total, func.count(Service.id))
+                       .join(Vehicle, Vehicle.client_id == Client.id)
+                       .join(Service, Service.vehicle_id == Vehicle.id)
+                       .filter(Service.date >= year_ago)
+                       .group_by(Client.id, Client.name)
+                       .order_by(total.desc())
+                       .limit(self.top_clients)
+                       .all())
+
+        return {
+            "generated_at": now.isoformat(timespec='seconds'),
+            "services_today": services_today,
+            "revenue_month": round(float(revenue_month), 2),
+            "services_month": services_month,
+            "appointments_today": [{
+                "starts_at": starts_at.isoformat(timespec='minutes'),
+                "ends_at": ends_at.isoformat(timespec='minutes'),
+                "status": status,
+                "description": description,
+                "license_plate": plate,
+                "bay": bay,
+            } for starts_at, ends_at, status, description, plate, bay in appointments_today],
+            "low_stock_parts": [
+                {"id": part_id, "name": name, "stock": stock}
+                for part_id, name, stock in low_stock
+            ],
+            "top_clients": [
+                {"id": client_id, "name": name, "total": round(float(spent), 2), "services": count}
+                for client_id, name, spent, count in top_clients
+            ],
+        }
@@ -1,8 +1,14 @@
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Float, ForeignKey, DateTime
+    create_engine, event, func, select, Column, Integer, String, Float, ForeignKey, DateTime, Text, Index
 )
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import relationship, sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Base do SQLAlchemy (api moderna)
 Base = declarative_base()
@@ -12,6 +18,33 @@ Base = declarative_base()
 #  DATABASE MANAGER — SINGLETON CORRIGIDO
 # ============================================================
 
+def _engine_options(db_uri, pool_size):
+    """Opções da engine conforme o banco (SQLite em arquivo usa pool fixo)."""
+    url = make_url(db_uri)
+    options = {"pool_pre_ping": True}
+
+    if url.get_backend_name() == 'sqlite':
+        options["connect_args"] = {
+            "check_same_thread": False,  # SQLite + Flask fix
+            "timeout": 30,  # espera o lock de escrita em vez de falhar
+        }
+        if url.database and url.database != ':memory:':
+            options["poolclass"] = QueuePool
+            options["pool_size"] = pool_size
+    else:
+        options["pool_size"] = pool_size
+
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL: leitores não bloqueiam o escritor (vários workers/threads)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 class DatabaseManager:
     """
     Singleton correto para gerenciar a engine e sessões.
@@ -20,14 +53,13 @@ class DatabaseManager:
 
     _instance = None
 
-    def __new__(cls, db_uri='sqlite:///autoar.db'):
+    def __new__(cls, db_uri='sqlite:///autoar.db', pool_size=5):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
 
-            cls._instance.engine = create_engine(
-                db_uri,
-                connect_args={"check_same_thread": False}  # SQLite + Flask fix
-            )
+            cls._instance.engine = create_engine(db_uri, **_engine_options(db_uri, pool_size))
+            if cls._instance.engine.dialect.name == 'sqlite':
+                event.listen(cls._instance.engine, 'connect', _set_sqlite_pragmas)
             cls._instance.Session = sessionmaker(bind=cls._instance.engine)
 
         return cls._instance
@@ -35,9 +67,43 @@ class DatabaseManager:
     def get_session(self):
         return self.Session()
 
+    def dispose(self):
+        """
+        Descarta o pool herdado do processo pai. Chamar no worker logo
+        após o fork (close=False não fecha as conexões do pai).
+        """
+        self.engine.dispose(close=False)
+
     def create_all(self):
         Base.metadata.create_all(self.engine)
 
+        # create_all não adiciona índices novos em tabelas já existentes
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(self.engine, checkfirst=True)
+                except (IntegrityError, OperationalError):
+                    # Índice único sobre dados já duplicados: a aplicação
+                    # sobe sem ele e o log aponta o que precisa ser corrigido
+                    if not index.unique:
+                        raise
+                    self._log_duplicates(index)
+
+    def _log_duplicates(self, index):
+        columns = list(index.columns)
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(*columns, func.count())
+                .group_by(*columns)
+                .having(func.count() > 1)
+            ).all()
+        duplicated = ', '.join(repr(tuple(row[:-1])) for row in rows)
+        logger.error(
+            "Índice único %s não criado: valores duplicados em %s.%s: %s. "
+            "Remova as duplicatas e reinicie a aplicação.",
+            index.name, index.table.name, ', '.join(c.name for c in columns), duplicated
+        )
+
 
 # ============================================================
 #  MODELO PRINCIPAL: CLIENTES
@@ -49,8 +115,8 @@ class Client(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(100), nullable=False)
     address = Column(String(200))
-    phone = Column(String(20))
-    email = Column(String(100))
+    phone = Column(String(20), index=True)
+    email = Column(String(100), index=True)
 
     vehicles = relationship(
         "Vehicle",
@@ -82,6 +148,11 @@ class Vehicle(Base):
         back_populates="vehicle",
         cascade="all, delete-orphan"
     )
+    appointments = relationship(
+        "Appointment",
+        back_populates="vehicle",
+        cascade="all, delete-orphan"
+    )
 
     def __repr__(self):
         return f"<Vehicle(id={self.id}, plate='{self.license_plate}')>"
@@ -97,12 +168,14 @@ class Service(Base):
     id = Column(Integer, primary_key=True)
     description = Column(String(200), nullable=False)
     cost = Column(Float, nullable=False)
-    date = Column(DateTime, default=datetime.datetime.utcnow)
+    date = Column(DateTime, default=datetime.datetime.utcnow, index=True)
     vehicle_id = Column(Integer, ForeignKey('vehicles.id'))
 
     vehicle = relationship("Vehicle", back_populates="services")
     parts = relationship("ServicePart", back_populates="service",
                          cascade="all, delete-orphan")
+    # Ao excluir o serviço, o agendamento concluído fica com service_id nulo
+    appointments = relationship("Appointment", back_populates="service")
 
     def __repr__(self):
         return f"<Service(id={self.id}, desc='{self.description}')>"
@@ -116,7 +189,7 @@ class Part(Base):
     __tablename__ = 'parts'
 
     id = Column(Integer, primary_key=True)
-    name = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False, index=True, unique=True)
     price = Column(Float, nullable=False)
     stock = Column(Integer, default=0)
 
@@ -153,25 +226,108 @@ class ServicePart(Base):
         return f"<ServicePart(service={self.service_id}, part={self.part_id}, qty={self.quantity})>"
 
 
+# ============================================================
+#  AGENDA: BOXES E AGENDAMENTOS
+# ============================================================
+
+class Bay(Base):
+    __tablename__ = 'bays'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(50), nullable=False, unique=True)
+
+    appointments = relationship("Appointment", back_populates="bay")
+
+    def __repr__(self):
+        return f"<Bay(id={self.id}, name='{self.name}')>"
+
+
+class Appointment(Base):
+    """
+    Agendamento de um veículo em um box, com duração estimada.
+    Ao ser concluído vira um Service (service_id).
+    """
+
+    __tablename__ = 'appointments'
+
+    id = Column(Integer, primary_key=True)
+    vehicle_id = Column(Integer, ForeignKey('vehicles.id'), nullable=False)
+    bay_id = Column(Integer, ForeignKey('bays.id'), nullable=False)
+    starts_at = Column(DateTime, nullable=False)
+    ends_at = Column(DateTime, nullable=False)
+    description = Column(String(400))
+    estimated_cost = Column(Float, default=0)
+    status = Column(String(20), nullable=False, default='scheduled')  # scheduled, completed, cancelled
+    service_id = Column(Integer, ForeignKey('services.id'))
+
+    vehicle = relationship("Vehicle", back_populates="appointments")
+    bay = relationship("Bay", back_populates="appointments")
+    service = relationship("Service", back_populates="appointments")
+
+    __table_args__ = (
+        Index('ix_appointments_bay_period', 'bay_id', 'starts_at', 'ends_at'),
+    )
+
+    def __repr__(self):
+        return f"<Appointment(id={self.id}, bay={self.bay_id}, starts_at={self.starts_at})>"
+
+
+# ============================================================
+#  CHANGE LOG (FEED DE ALTERAÇÕES)
+# ============================================================
+
+class ChangeLog(Base):
+    """
+    Registro append-only das gravações em Client, Vehicle, Service,
+    Part, ServicePart, Bay e Appointment. O id é o cursor usado pelos
+    consumidores.
+    """
+
+    __tablename__ = 'change_log'
+
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(30), nullable=False)
+    entity_id = Column(String(50), nullable=False)
+    operation = Column(String(10), nullable=False)  # insert, update, delete
+    data = Column(Text)  # JSON com o estado da linha
+    changed = Column(Text)  # JSON com os campos alterados (update)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+    __table_args__ = (
+        Index('ix_change_log_entity', 'entity', 'entity_id'),
+        # max(id) por entidade (versão da agenda) em O(log n)
+        Index('ix_change_log_entity_cursor', 'entity', 'id'),
+    )
+
+    def __repr__(self):
+        return f"<ChangeLog(id={self.id}, {self.operation} {self.entity}:{self.entity_id})>"
+
+
 # ============================================================
 #  FACTORY METHOD
 # ============================================================
 
 class ModelFactory:
     @staticmethod
-    def create_model(model_name, **kwargs):
+    def get_class(model_name):
         classes = {
             'Client': Client,
             'Vehicle': Vehicle,
             'Service': Service,
             'Part': Part,
-            'ServicePart': ServicePart
+            'ServicePart': ServicePart,
+            'Bay': Bay,
+            'Appointment': Appointment
         }
 
         if model_name not in classes:
             raise ValueError(f"Unknown model: {model_name}")
 
-        return classes[model_name](**kwargs)
+        return classes[model_name]
+
+    @staticmethod
+    def create_model(model_name, **kwargs):
+        return ModelFactory.get_class(model_name)(**kwargs)
 
 
 # ============================================================
@@ -193,33 +349,10 @@ class WorkshopServiceFacade:
 
         session = self.db_manager.get_session()
         try:
-            service = Service(
-                description=description,
-                cost=cost,
-                vehicle_id=vehicle_id
-            )
-
-            session.add(service)
-            session.flush()
-
-            for p in parts_list:
-                part = session.get(Part, p["part_id"])
-                if not part:
-                    continue
-
-                # vínculo com quantidade
-                sp = ServicePart(
-                    service_id=service.id,
-                    part_id=part.id,
-                    quantity=p["quantity"]
-                )
-
-                session.add(sp)
-
-                # atualiza estoque
-                part.stock -= p["quantity"]
-
+            service = self.add_service_with_parts(session, vehicle_id, description, cost, parts_list)
             session.commit()
+            # recarrega para o objeto continuar legível após fechar a sessão
+            session.refresh(service)
             return service
 
         except Exception:
@@ -228,3 +361,37 @@ class WorkshopServiceFacade:
 
         finally:
             session.close()
+
+    def add_service_with_parts(self, session, vehicle_id, description, cost, parts_list):
+        """
+        Mesma operação dentro de uma sessão do chamador (sem commit), para
+        quem precisa gravar o serviço junto com outras alterações.
+        """
+        service = Service(
+            description=description,
+            cost=cost,
+            vehicle_id=vehicle_id,
+            date=datetime.datetime.now()  # mesmo relógio das rotas e do dashboard
+        )
+
+        session.add(service)
+        session.flush()
+
+        for p in parts_list:
+            part = session.get(Part, p["part_id"])
+            if not part:
+                continue
+
+            # vínculo com quantidade
+            sp = ServicePart(
+                service_id=service.id,
+                part_id=part.id,
+                quantity=p["quantity"]
+            )
+
+            session.add(sp)
+
+            # atualiza estoque
+            part.stock -= p["quantity"]
+
+        return service
@@ -0,0 +1,362 @@
+import bisect
+import datetime
+import threading
+
+from sqlalchemy import func, update
+
+from models import Appointment, Bay, ChangeLog, Vehicle, WorkshopServiceFacade
+
+
+# Horários sugeridos começam em múltiplos de 15 minutos
+SLOT_MINUTES = 15
+
+# Entidades do change_log que alteram a disponibilidade dos boxes
+SCHEDULE_ENTITIES = ('Appointment', 'Bay')
+
+
+class SchedulingError(ValueError):
+    """Agendamento inválido ou em conflito com outro."""
+
+
+def _align(moment, duration, open_hour, close_hour):
+    """Primeiro instante >= moment em que `duration` cabe no expediente."""
+    while True:
+        day_open = moment.replace(hour=open_hour, minute=0, second=0, microsecond=0)
+        day_close = day_open.replace(hour=close_hour)
+        if moment < day_open:
+            moment = day_open
+        if moment + duration <= day_close:
+            return moment
+        moment = day_open + datetime.timedelta(days=1)
+
+
+def _ceil_slot(moment):
+    """Arredonda para cima até o próximo múltiplo de SLOT_MINUTES."""
+    base = moment.replace(minute=0, second=0, microsecond=0)
+    step = datetime.timedelta(minutes=SLOT_MINUTES)
+    return base + -(-(moment - base) // step) * step
+
+
+def _require_naive(moment):
+    # A agenda usa horário local sem fuso, como o restante do sistema
+    if moment is not None and moment.tzinfo is not None:
+        raise SchedulingError('Informe data/hora sem fuso horário (horário local da oficina).')
+
+
+def _lock_schedule(session):
+    """
+    Serializa as escritas na agenda até o commit da sessão.
+    PostgreSQL: SELECT ... FOR UPDATE nas linhas de bays.
+    SQLite: o pysqlite só abre a transação no primeiro comando de escrita,
+    então um UPDATE inócuo em bays pega o lock de escrita do banco logo
+    no início (mesmo efeito de BEGIN IMMEDIATE); os demais esperam o
+    timeout de conexão.
+    """
+    if session.get_bind().dialect.name == 'sqlite':
+        session.execute(
+            update(Bay).values(name=Bay.name).execution_options(synchronize_session=False)
+        )
+    else:
+        session.query(Bay.id).with_for_update().all()
+
+
+# ============================================================
+#  ÍNDICE DE DISPONIBILIDADE
+# ============================================================
+
+class AvailabilityIndex:
+    """
+    Ocupação de cada box em arrays ordenados (início, fim, id).
+    Os agendamentos de um box nunca se sobrepõem (as reservas são
+    serializadas por _lock_schedule), então os inícios e os fins ficam
+    ordenados juntos e toda busca é binária (bisect).
+    """
+
+    def __init__(self, bay_ids=()):
+        self._slots = {bay_id: ([], [], []) for bay_id in bay_ids}
+
+    @classmethod
+    def from_rows(cls, bay_ids, rows):
+        """Monta o índice em O(n) a partir de (bay_id, início, fim, id) ordenados por box e início."""
+        index = cls(bay_ids)
+        for bay_id, starts_at, ends_at, appointment_id in rows:
+            starts, ends, ids = index._slots.setdefault(bay_id, ([], [], []))
+            starts.append(starts_at)
+            ends.append(ends_at)
+            ids.append(appointment_id)
+        return index
+
+    @property
+    def bay_ids(self):
+        return list(self._slots)
+
+    def add(self, bay_id, starts_at, ends_at, appointment_id):
+        starts, ends, ids = self._slots.setdefault(bay_id, ([], [], []))
+        i = bisect.bisect_left(starts, starts_at)
+        starts.insert(i, starts_at)
+        ends.insert(i, ends_at)
+        ids.insert(i, appointment_id)
+
+    def remove(self, bay_id, starts_at, appointment_id):
+        starts, ends, ids = self._slots.get(bay_id, ([], [], []))
+        i = bisect.bisect_left(starts, starts_at)
+        while i < len(starts) and starts[i] == starts_at:
+            if ids[i] == appointment_id:
+                del starts[i], ends[i], ids[i]
+                return
+            i += 1
+
+    def overlaps(self, bay_id, starts_at, ends_at):
+        """True se [starts_at, ends_at) conflita com algum agendamento do box."""
+        starts, ends, _ = self._slots[bay_id]
+        # Entre os que começam antes do fim pedido, o último é o que termina mais tarde
+        i = bisect.bisect_left(starts, ends_at)
+        return i > 0 and ends[i - 1] > starts_at
+
+    def next_free(self, bay_id, after, duration, open_hour, close_hour):
+        """Primeiro início >= after em que o box fica livre por `duration`."""
+        starts, ends, _ = self._slots[bay_id]
+        candidate = _align(after, duration, open_hour, close_hour)
+        i = bisect.bisect_right(ends, candidate)
+        while i < len(starts) and starts[i] < candidate + duration:
+            candidate = _align(max(candidate, ends[i]), duration, open_hour, close_hour)
+            i = bisect.bisect_right(ends, candidate, i)
+        return candidate
+
+
+# ============================================================
+#  AGENDA
+# ============================================================
+
+class Scheduler:
+    """
+    Agenda de boxes. Mantém um AvailabilityIndex em memória com os
+    agendamentos futuros. As escritas deste processo atualizam o índice
+    diretamente; ele só é recarregado do banco quando o change_log mostra
+    que outro worker alterou a agenda.
+
+    Toda escrita pega o lock da agenda (_lock_schedule) antes de
+    consultar o índice, então a verificação de conflito e o INSERT são
+    atômicos entre threads e processos.
+    """
+
+    def __init__(self, db_manager, open_hour=8, close_hour=18):
+        self.db_manager = db_manager
+        self.open_hour = open_hour
+        self.close_hour = close_hour
+        self.index = AvailabilityIndex()
+        self._version = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def ensure_bays(self, count):
+        """Cria os boxes que faltam até `count` ("Box 1", "Box 2", ...)."""
+        session = self.db_manager.get_session()
+        try:
+            existing = session.query(func.count(Bay.id)).scalar()
+            for number in range(existing + 1, count + 1):
+                session.add(Bay(name=f'Box {number}'))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    # -------------------
+    # Sincronia do índice (sempre com self._lock)
+    # -------------------
+    @staticmethod
+    def _current_version(session):
+        # Um max(id) por entidade: cada um é uma busca em ix_change_log_entity_cursor
+        # (com IN o banco percorreria todas as entradas das duas entidades)
+        latest = [session.query(func.max(ChangeLog.id))
+                  .filter(ChangeLog.entity == entity)
+                  .scalar_subquery()
+                  for entity in SCHEDULE_ENTITIES]
+        return max((v for v in session.query(*latest).one() if v is not None), default=None)
+
+    def _sync(self, session):
+        """Recarrega o índice só se outro processo gravou na agenda."""
+        version = self._current_version(session)
+        if self._loaded and version == self._version:
+            return
+
+        # Só o que ainda não terminou importa para a disponibilidade
+        rows = (session.query(Appointment.bay_id, Appointment.starts_at,
+                              Appointment.ends_at, Appointment.id)
+                .filter(Appointment.status == 'scheduled',
+                        Appointment.ends_at > datetime.datetime.now())
+                .order_by(Appointment.bay_id, Appointment.starts_at)
+                .all())
+        bay_ids = [bay_id for (bay_id,) in session.query(Bay.id).order_by(Bay.id)]
+
+        self.index = AvailabilityIndex.from_rows(bay_ids, rows)
+        self._version = version
+        self._loaded = True
+
+    def _commit(self, session):
+        """Faz o commit e anota a versão do change_log que já inclui esta escrita."""
+        session.flush()
+        version = self._current_version(session)
+        session.commit()
+        self._version = version
+
+    # -------------------
+    # Consultas
+    # -------------------
+    def _check_duration(self, duration):
+        if duration > datetime.timedelta(hours=self.close_hour - self.open_hour):
+            raise SchedulingError('Duração maior que o expediente da oficina.')
+
+    def next_free_slot(self, duration_minutes, after=None, bay_id=None):
+        """
+        Retorna (bay_id, início) do primeiro horário livre para um serviço
+        de `duration_minutes`, no box informado ou em qualquer box.
+        """
+        _require_naive(after)
+        duration = datetime.timedelta(minutes=duration_minutes)
+        self._check_duration(duration)
+        now = datetime.datetime.now()
+        after = _ceil_slot(max(after or now, now))
+
+        session = self.db_manager.get_session()
+        try:
+            with self._lock:
+                self._sync(session)
+                index = self.index
+        finally:
+            session.close()
+
+        bay_ids = [bay_id] if bay_id is not None else index.bay_ids
+        if not bay_ids or any(b not in index.bay_ids for b in bay_ids):
+            raise SchedulingError('Box não encontrado.')
+
+        slots = [(index.next_free(b, after, duration, self.open_hour, self.close_hour), b)
+                 for b in bay_ids]
+        starts_at, chosen = min(slots)
+        return chosen, starts_at
+
+    # -------------------
+    # Escritas
+    # -------------------
+    def book(self, vehicle_id, starts_at, duration_minutes, bay_id=None,
+             description=None, estimated_cost=None):
+        """
+        Agenda o veículo. Sem bay_id usa o primeiro box livre no horário.
+        Retorna o id do agendamento.
+        """
+        _require_naive(starts_at)
+        duration = datetime.timedelta(minutes=duration_minutes)
+        self._check_duration(duration)
+        ends_at = starts_at + duration
+
+        if starts_at < datetime.datetime.now():
+            raise SchedulingError('Não é possível agendar no passado.')
+        if _align(starts_at, duration, self.open_hour, self.close_hour) != starts_at:
+            raise SchedulingError(
+                f'O serviço deve ocorrer dentro do expediente '
+                f'({self.open_hour:02d}h às {self.close_hour:02d}h).'
+            )
+
+        session = self.db_manager.get_session()
+        try:
+            _lock_schedule(session)
+            with self._lock:
+                self._sync(session)
+                index = self.index
+
+                if not session.get(Vehicle, vehicle_id):
+                    raise SchedulingError('Veículo não encontrado.')
+                if bay_id is not None and bay_id not in index.bay_ids:
+                    raise SchedulingError('Box não encontrado.')
+
+                candidates = [bay_id] if bay_id is not None else index.bay_ids
+                chosen = next((b for b in candidates if not index.overlaps(b, starts_at, ends_at)), None)
+                if chosen is None:
+                    raise SchedulingError('Horário indisponível para o box escolhido.')
+
+                appointment = Appointment(
+                    vehicle_id=vehicle_id,
+                    bay_id=chosen,
+                    starts_at=starts_at,
+                    ends_at=ends_at,
+                    description=description,
+                    estimated_cost=estimated_cost or 0,
+                )
+                session.add(appointment)
+                session.flush()
+                appointment_id = appointment.id
+
+                self._commit(session)
+                index.add(chosen, starts_at, ends_at, appointment_id)
+                return appointment_id
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _get_scheduled(self, session, appointment_id):
+        appointment = session.get(Appointment, appointment_id)
+        if not appointment:
+            raise SchedulingError('Agendamento não encontrado.')
+        if appointment.status != 'scheduled':
+            raise SchedulingError('Agendamento já foi concluído ou cancelado.')
+        return appointment
+
+    def cancel(self, appointment_id):
+        session = self.db_manager.get_session()
+        try:
+            _lock_schedule(session)
+            with self._lock:
+                self._sync(session)
+                appointment = self._get_scheduled(session, appointment_id)
+                appointment.status = 'cancelled'
+                bay_id, starts_at = appointment.bay_id, appointment.starts_at
+
+                self._commit(session)
+                self.index.remove(bay_id, starts_at, appointment_id)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def complete(self, appointment_id, parts_list=()):
+        """
+        Conclui o agendamento registrando o Service correspondente pelo
+        WorkshopServiceFacade, na mesma transação que muda a situação do
+        agendamento. Retorna o serviço criado.
+        """
+        session = self.db_manager.get_session()
+        try:
+            _lock_schedule(session)
+            with self._lock:
+                self._sync(session)
+                # Relido com o lock: dois cliques em "Concluir" não geram dois serviços
+                appointment = self._get_scheduled(session, appointment_id)
+
+                facade = WorkshopServiceFacade(self.db_manager)
+                service = facade.add_service_with_parts(
+                    session,
+                    appointment.vehicle_id,
+                    appointment.description or 'Serviço agendado',
+                    appointment.estimated_cost or 0,
+                    list(parts_list),
+                )
+                appointment.status = 'completed'
+                appointment.service_id = service.id
+                bay_id, starts_at = appointment.bay_id, appointment.starts_at
+
+                self._commit(session)
+                self.index.remove(bay_id, starts_at, appointment_id)
+
+            # recarrega para o objeto continuar legível após fechar a sessão
+            session.refresh(service)
+            return service
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
@@ -0,0 +1,145 @@
+import datetime
+import os
+import sys
+import types
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import changefeed  # noqa: E402
+import uniqueness  # noqa: E402
+from models import Base, ChangeLog, Client, Part  # noqa: E402
+
+
+@pytest.fixture
+def session(tmp_path):
+    # Banco próprio por teste (não usa o singleton DatabaseManager)
+    engine = create_engine(f"sqlite:///{tmp_path / 'feed.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    changefeed.install(types.SimpleNamespace(Session=Session))
+
+    s = Session()
+    yield s
+    s.close()
+    # o registro de eventos usa id(): sem remover, um sessionmaker novo com o
+    # mesmo id faria install() achar que o listener já existe
+    event.remove(Session, 'after_flush', changefeed._after_flush)
+    engine.dispose()
+
+
+def read_all(session, since=0):
+    entries, _, _ = changefeed.read_changes(session, since, limit=1000)
+    return entries
+
+
+def test_flush_records_insert_update_and_delete(session):
+    client = Client(name='Ana', phone='123')
+    session.add(client)
+    session.commit()
+    client.phone = '456'
+    session.commit()
+    session.delete(client)
+    session.commit()
+
+    entries = read_all(session)
+    assert [(e["entity"], e["entity_id"], e["operation"]) for e in entries] == [
+        ('Client', str(client.id), 'insert'),
+        ('Client', str(client.id), 'update'),
+        ('Client', str(client.id), 'delete'),
+    ]
+    assert entries[1]["changed"] == ['phone']
+    assert entries[1]["data"]["phone"] == '456'
+    assert entries[0]["changed"] is None
+
+
+def test_read_changes_pages_with_cursor(session):
+    session.add_all([Client(name=f'Cliente {n}') for n in range(5)])
+    session.commit()
+
+    names, since, pages = [], 0, 0
+    while True:
+        entries, since, has_more = changefeed.read_changes(session, since, limit=2)
+        names += [e["data"]["name"] for e in entries]
+        pages += 1
+        if not has_more:
+            break
+
+    assert names == [f'Cliente {n}' for n in range(5)]
+    assert pages == 3
+
+    # Sem entradas novas o cursor não anda
+    entries, next_cursor, has_more = changefeed.read_changes(session, since, limit=2)
+    assert (entries, next_cursor, has_more) == ([], since, False)
+
+
+def test_read_changes_exact_page_has_no_more(session):
+    session.add_all([Client(name='A'), Client(name='B')])
+    session.commit()
+
+    entries, next_cursor, has_more = changefeed.read_changes(session, 0, limit=2)
+    assert len(entries) == 2
+    assert not has_more
+    assert next_cursor == entries[-1]["cursor"]
+
+
+def test_record_keys_distinguishes_insert_update_and_unchanged(session):
+    session.add_all([Part(name='Óleo', price=30.0, stock=10), Part(name='Correia', price=80.0, stock=3)])
+    session.commit()
+    _, cursor, _ = changefeed.read_changes(session)
+
+    records = [
+        {"name": 'Óleo', "price": 30.0, "stock": 1},     # estoque alterado
+        {"name": 'Correia', "price": 80.0, "stock": 3},  # igual ao banco
+        {"name": 'Filtro', "price": 25.0, "stock": 7},   # nova
+    ]
+    keys = [r["name"] for r in records]
+    before = changefeed.snapshot_keys(session, Part, 'name', keys)
+    uniqueness.upsert_many('Part', records, session)
+    changefeed.record_keys(session, Part, 'name', keys, before)
+    session.commit()
+
+    entries = read_all(session, cursor)
+    by_name = {e["data"]["name"]: e for e in entries}
+    assert set(by_name) == {'Óleo', 'Filtro'}
+    assert by_name['Óleo']["operation"] == 'update'
+    assert by_name['Óleo']["changed"] == ['stock']
+    assert by_name['Filtro']["operation"] == 'insert'
+    assert by_name['Filtro']["changed"] is None
+    assert by_name['Filtro']["entity_id"] == str(by_name['Filtro']["data"]["id"])
+
+
+def test_compact_keeps_latest_entry_per_entity(session):
+    old = datetime.datetime.utcnow() - datetime.timedelta(days=60)
+    recent = datetime.datetime.utcnow()
+    rows = [
+        ('1', 'insert', old),
+        ('1', 'update', old),
+        ('1', 'update', recent),
+        ('2', 'insert', old),
+        ('2', 'update', old),
+        ('3', 'insert', old),
+    ]
+    session.add_all([ChangeLog(entity='Client', entity_id=entity_id, operation=operation,
+                               data='{}', created_at=created_at)
+                     for entity_id, operation, created_at in rows])
+    session.commit()
+
+    assert changefeed.compact(session, older_than_days=30) == 3
+    session.commit()
+
+    kept = [(e["entity_id"], e["operation"]) for e in read_all(session)]
+    assert kept == [('1', 'update'), ('2', 'update'), ('3', 'insert')]
+
+
+def test_compact_keeps_recent_history(session):
+    recent = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    session.add_all([ChangeLog(entity='Part', entity_id='1', operation=operation,
+                               data='{}', created_at=recent)
+                     for operation in ('insert', 'update', 'update')])
+    session.commit()
+
+    assert changefeed.compact(session, older_than_days=30) == 0
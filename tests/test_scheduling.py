@@ -0,0 +1,91 @@
+import datetime
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduling import AvailabilityIndex, SchedulingError, _ceil_slot, _require_naive  # noqa: E402
+
+DAY = datetime.datetime(2030, 1, 7)
+HOUR = datetime.timedelta(hours=1)
+OPEN, CLOSE = 8, 18
+
+
+def at(hour, minute=0, day=0):
+    return DAY + datetime.timedelta(days=day, hours=hour, minutes=minute)
+
+
+@pytest.fixture
+def index():
+    # Box 1 ocupado das 8h às 9h, 10h às 11h e 12h às 13h; box 2 livre
+    idx = AvailabilityIndex([1, 2])
+    for appointment_id, hour in enumerate((8, 10, 12), start=1):
+        idx.add(1, at(hour), at(hour + 1), appointment_id)
+    return idx
+
+
+def test_overlaps_detects_partial_and_containing_intervals(index):
+    assert index.overlaps(1, at(8, 30), at(9, 30))
+    assert index.overlaps(1, at(9, 30), at(10, 30))
+    assert index.overlaps(1, at(7), at(14))
+    assert index.overlaps(1, at(10, 15), at(10, 45))
+
+
+def test_overlaps_allows_touching_intervals(index):
+    assert not index.overlaps(1, at(9), at(10))
+    assert not index.overlaps(1, at(11), at(12))
+    assert not index.overlaps(1, at(13), at(14))
+    assert not index.overlaps(1, at(6), at(8))
+
+
+def test_overlaps_on_empty_bay(index):
+    assert not index.overlaps(2, at(8), at(18))
+
+
+def test_next_free_finds_first_gap(index):
+    assert index.next_free(1, at(8), HOUR, OPEN, CLOSE) == at(9)
+    assert index.next_free(1, at(8), 2 * HOUR, OPEN, CLOSE) == at(13)
+    assert index.next_free(2, at(8), 2 * HOUR, OPEN, CLOSE) == at(8)
+
+
+def test_next_free_starts_after_requested_time(index):
+    assert index.next_free(1, at(9, 30), HOUR, OPEN, CLOSE) == at(11)
+    assert index.next_free(1, at(10, 30), 30 * datetime.timedelta(minutes=1), OPEN, CLOSE) == at(11)
+
+
+def test_next_free_respects_opening_hours(index):
+    assert index.next_free(1, at(6), HOUR, OPEN, CLOSE) == at(9)
+    assert index.next_free(1, at(17), 2 * HOUR, OPEN, CLOSE) == at(8, day=1)
+    assert index.next_free(2, at(19), HOUR, OPEN, CLOSE) == at(8, day=1)
+
+
+def test_remove_frees_the_slot(index):
+    index.remove(1, at(10), 2)
+    assert not index.overlaps(1, at(10), at(11))
+    assert index.next_free(1, at(8), 3 * HOUR, OPEN, CLOSE) == at(9)
+    # id ou início que não existem são ignorados
+    index.remove(1, at(10), 2)
+    index.remove(1, at(8), 99)
+    assert index.overlaps(1, at(8), at(9))
+
+
+def test_from_rows_matches_incremental_add(index):
+    rows = [(1, at(hour), at(hour + 1), n) for n, hour in enumerate((8, 10, 12), start=1)]
+    built = AvailabilityIndex.from_rows([1, 2], rows)
+    assert built._slots == index._slots
+
+
+def test_ceil_slot_rounds_up_to_quarter_hour():
+    assert _ceil_slot(at(9)) == at(9)
+    assert _ceil_slot(at(9, 0) + datetime.timedelta(microseconds=1)) == at(9, 15)
+    assert _ceil_slot(at(9, 14)) == at(9, 15)
+    assert _ceil_slot(at(9, 50)) == at(10)
+
+
+def test_require_naive_rejects_aware_datetimes():
+    _require_naive(at(9))
+    _require_naive(None)
+    with pytest.raises(SchedulingError):
+        _require_naive(at(9).replace(tzinfo=datetime.timezone.utc))
@@ -0,0 +1,98 @@
+import datetime
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validators import PLATE_RE, YEAR_RE, Rule, validate, validate_many  # noqa: E402
+
+
+def vehicle(**overrides):
+    data = {"make": "VW", "model": "Gol", "year": "2010", "license_plate": "ABC1234", "client_id": "1"}
+    data.update(overrides)
+    return data
+
+
+def test_rule_strips_and_coerces_form_text():
+    rule = Rule('year', 'ano', pattern=YEAR_RE, coerce=int)
+    assert rule.apply(' 2010 ') == (2010, None)
+
+
+def test_rule_required_and_optional_empty_values():
+    assert Rule('name', 'obrigatório').apply('  ') == (None, 'obrigatório')
+    assert Rule('name', 'obrigatório').apply(None) == (None, 'obrigatório')
+    assert Rule('email', 'e-mail', required=False).apply('') == (None, None)
+
+
+@pytest.mark.parametrize('raw', [True, False, ["x"], {"a": 1}, b'ABC'])
+def test_rule_rejects_non_scalar_json_values(raw):
+    assert Rule('email', 'e-mail', required=False, max_length=100).apply(raw) == (None, 'e-mail')
+
+
+def test_rule_applies_text_rules_to_json_numbers():
+    year = Rule('year', 'ano', pattern=YEAR_RE, coerce=int)
+    plate = Rule('license_plate', 'placa', pattern=PLATE_RE)
+    assert year.apply(2010) == (2010, None)
+    assert year.apply(99999) == (None, 'ano')
+    assert plate.apply(1234567) == ('1234567', None)
+    assert plate.apply(1234567890) == (None, 'placa')
+
+
+@pytest.mark.parametrize('raw', ['nan', 'inf', '-inf', float('nan'), float('inf'), '1e400'])
+def test_rule_rejects_non_finite_numbers(raw):
+    assert Rule('cost', 'custo', coerce=float).apply(raw) == (None, 'custo')
+
+
+def test_rule_turns_coerce_and_check_errors_into_messages():
+    assert Rule('stock', 'estoque', coerce=int).apply('abc') == (None, 'estoque')
+    assert Rule('stock', 'estoque', coerce=int, check=lambda v: v >= 0).apply('-1') == (None, 'estoque')
+
+
+@pytest.mark.parametrize('cost', ['999999', 999999.99])
+def test_validate_service_cost_limit(cost):
+    data = {"description": "Troca de óleo", "cost": cost, "vehicle_id": "1"}
+    clean, errors = validate('Service', data)
+    assert errors == {}
+    assert clean["cost"] == float(cost)
+
+
+def test_validate_service_rejects_seven_digit_cost():
+    _, errors = validate('Service', {"description": "x", "cost": "1000000", "vehicle_id": "1"})
+    assert set(errors) == {'cost'}
+
+
+def test_validate_appointment_rejects_aware_datetime():
+    data = {"vehicle_id": "1", "starts_at": "2030-01-07T09:00:00+00:00",
+            "duration_minutes": "60", "description": "Revisão"}
+    _, errors = validate('Appointment', data)
+    assert set(errors) == {'starts_at'}
+
+    data["starts_at"] = datetime.datetime(2030, 1, 7, 9)
+    clean, errors = validate('Appointment', data)
+    assert errors == {}
+    assert clean["starts_at"] == datetime.datetime(2030, 1, 7, 9)
+
+
+def test_validate_unknown_model():
+    with pytest.raises(ValueError):
+        validate('Unknown', {})
+
+
+def test_validate_many_splits_valid_and_invalid_by_index():
+    records = [
+        vehicle(),
+        vehicle(year=99999),
+        vehicle(license_plate=1234567890, client_id=True),
+        vehicle(license_plate="XYZ9", year=1999, client_id=2),
+    ]
+    valid, invalid = validate_many('Vehicle', records)
+
+    assert [v["license_plate"] for v in valid] == ["ABC1234", "XYZ9"]
+    assert valid[1] == {"make": "VW", "model": "Gol", "year": 1999,
+                        "license_plate": "XYZ9", "client_id": 2}
+    assert [(e["index"], set(e["errors"])) for e in invalid] == [
+        (1, {'year'}),
+        (2, {'license_plate', 'client_id'}),
+    ]
@@ -0,0 +1,175 @@
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import ModelFactory
+
+
+# ============================================================
+#  CHAVES CANDIDATAS POR MODELO
+# ============================================================
+
+UNIQUE_KEYS = {
+    'Client': ('email', 'phone'),
+    'Vehicle': ('license_plate',),
+    'Part': ('name',),
+}
+
+# Chave usada no ON CONFLICT (precisa de um índice único no banco)
+UPSERT_KEYS = {
+    'Vehicle': 'license_plate',
+    'Part': 'name',
+}
+
+MESSAGES = {
+    ('Client', 'email'): 'Já existe um cliente com este e-mail.',
+    ('Client', 'phone'): 'Já existe um cliente com este telefone.',
+    ('Vehicle', 'license_plate'): 'Já existe um veículo com esta placa.',
+    ('Part', 'name'): 'Já existe uma peça com este nome.',
+}
+
+# Chaves estrangeiras conferidas antes de gravar um lote
+REFERENCES = {
+    'Vehicle': {'client_id': 'Client'},
+}
+
+REFERENCE_MESSAGES = {
+    ('Vehicle', 'client_id'): 'Cliente não encontrado.',
+}
+
+# Limite de parâmetros por IN (o SQLite antigo aceita no máximo 999)
+CHUNK_SIZE = 500
+
+INSERT_BY_DIALECT = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+# ============================================================
+#  VERIFICAÇÃO DE UNICIDADE
+# ============================================================
+#  Verifica chaves candidatas (placa, e-mail/telefone, nome da peça)
+#  consultando os índices ANTES de gravar, em vez de depender da
+#  exceção do commit. Também faz upsert em lote com ON CONFLICT.
+
+
+def _existing(session, column, values):
+    """
+    Retorna {valor: {ids}} dos valores já gravados, em lotes de CHUNK_SIZE.
+    Um valor pode ter vários ids quando a coluna não tem índice único.
+    """
+    model = column.class_
+    found = {}
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        chunk = values[start:start + CHUNK_SIZE]
+        for value, row_id in session.query(column, model.id).filter(column.in_(chunk)):
+            found.setdefault(value, set()).add(row_id)
+    return found
+
+
+def find_conflicts(model_name, records, session, exclude_ids=None, check_existing=True):
+    """
+    Verifica um lote de registros já validados.
+    Retorna uma lista alinhada com records, com {campo: mensagem}
+    para cada registro (dict vazio quando não há conflito).
+    Detecta duplicatas no banco e dentro do próprio lote (a primeira
+    ocorrência passa, as seguintes são rejeitadas).
+    exclude_ids, se informado, traz o id de cada registro (edição),
+    para que ele não conflite consigo mesmo.
+    check_existing=False verifica só o lote (upsert: o que já está no
+    banco vira atualização).
+    """
+    model = ModelFactory.get_class(model_name)
+    errors = [{} for _ in records]
+
+    for field in UNIQUE_KEYS[model_name]:
+        message = MESSAGES[(model_name, field)]
+        values = {r.get(field) for r in records if r.get(field)}
+        if not values:
+            continue
+
+        existing = _existing(session, getattr(model, field), values) if check_existing else {}
+        seen = set()
+        for index, record in enumerate(records):
+            value = record.get(field)
+            if not value:
+                continue
+            own_id = exclude_ids[index] if exclude_ids else None
+            if value in seen or existing.get(value, set()) - {own_id}:
+                errors[index][field] = message
+            seen.add(value)
+
+    return errors
+
+
+def find_missing_references(model_name, records, session):
+    """
+    Confere as chaves estrangeiras de REFERENCES com um IN por campo.
+    Retorna uma lista alinhada com records, com {campo: mensagem}.
+    """
+    errors = [{} for _ in records]
+
+    for field, target_name in REFERENCES.get(model_name, {}).items():
+        message = REFERENCE_MESSAGES[(model_name, field)]
+        target = ModelFactory.get_class(target_name)
+        values = {r.get(field) for r in records if r.get(field) is not None}
+        if not values:
+            continue
+
+        found = _existing(session, target.id, values)
+        for index, record in enumerate(records):
+            value = record.get(field)
+            if value is not None and value not in found:
+                errors[index][field] = message
+
+    return errors
+
+
+def check(model_name, data, session, exclude_id=None):
+    """Versão para um único registro. Retorna {campo: mensagem}."""
+    exclude_ids = [exclude_id] if exclude_id is not None else None
+    return find_conflicts(model_name, [data], session, exclude_ids)[0]
+
+
+def can_upsert(model_name, session):
+    """
+    True se o banco tem o índice único exigido pelo ON CONFLICT. Ele pode
+    faltar quando o create_all não o criou por causa de dados duplicados.
+    """
+    key = UPSERT_KEYS.get(model_name)
+    if key is None:
+        return False
+
+    table = ModelFactory.get_class(model_name).__table__
+    inspector = inspect(session.connection())
+    unique_columns = [c['column_names'] for c in inspector.get_unique_constraints(table.name)]
+    unique_columns += [i['column_names'] for i in inspector.get_indexes(table.name) if i['unique']]
+    return [key] in unique_columns
+
+
+def upsert_many(model_name, records, session):
+    """
+    Grava um lote com INSERT ... ON CONFLICT DO UPDATE na chave de
+    UPSERT_KEYS, em comandos de até CHUNK_SIZE parâmetros. Não faz commit.
+    """
+    if not records:
+        return 0
+
+    insert = INSERT_BY_DIALECT.get(session.get_bind().dialect.name)
+    if insert is None:
+        raise ValueError(f"Upsert não suportado no banco: {session.get_bind().dialect.name}")
+    if model_name not in UPSERT_KEYS:
+        raise ValueError(f"Modelo sem chave de upsert: {model_name}")
+
+    key = UPSERT_KEYS[model_name]
+    table = ModelFactory.get_class(model_name).__table__
+    rows_per_chunk = max(CHUNK_SIZE // len(records[0]), 1)
+    for start in range(0, len(records), rows_per_chunk):
+        stmt = insert(table).values(records[start:start + rows_per_chunk])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key],
+            set_={name: stmt.excluded[name] for name in records[0] if name != key}
+        )
+        session.execute(stmt)
+    return len(records)
@@ -0,0 +1,187 @@
+import datetime
+import math
+import re
+
+
+# ============================================================
+#  EXPRESSÕES REGULARES (COMPILADAS UMA ÚNICA VEZ)
+# ============================================================
+
+YEAR_RE = re.compile(r'^\d{1,4}$')
+PLATE_RE = re.compile(r'^[A-Z0-9]{1,7}$')
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+PHONE_RE = re.compile(r'^[0-9()+\-\s]{0,20}$')
+
+
+# ============================================================
+#  REGRAS
+# ============================================================
+
+# Tipos aceitos como valor bruto (JSON também traz listas, dicts e bool)
+SCALAR_TYPES = (str, int, float, datetime.datetime)
+
+class Rule:
+    """
+    Regra declarativa de um campo: converte o valor bruto (texto de
+    formulário ou JSON) e verifica as restrições do campo.
+    """
+
+    __slots__ = ('field', 'message', 'required', 'max_length', 'pattern', 'coerce', 'check')
+
+    def __init__(self, field, message, required=True, max_length=None,
+                 pattern=None, coerce=None, check=None):
+        self.field = field
+        self.message = message
+        self.required = required
+        self.max_length = max_length
+        self.pattern = pattern
+        self.coerce = coerce
+        self.check = check
+
+    def apply(self, raw):
+        """Retorna (valor, erro). Apenas um dos dois é diferente de None."""
+        value = raw.strip() if isinstance(raw, str) else raw
+
+        if value is None or value == '':
+            if self.required:
+                return None, self.message
+            return None, None
+
+        if isinstance(value, bool) or not isinstance(value, SCALAR_TYPES):
+            return None, self.message
+
+        # Números vindos de JSON passam pelas mesmas regras de texto
+        if self.max_length is not None or self.pattern is not None:
+            if not isinstance(value, str):
+                value = str(value)
+            if self.max_length is not None and len(value) > self.max_length:
+                return None, self.message
+            if self.pattern is not None and not self.pattern.match(value):
+                return None, self.message
+
+        try:
+            if self.coerce is not None:
+                value = self.coerce(value)
+            if isinstance(value, float) and not math.isfinite(value):
+                return None, self.message
+            if self.check is not None and not self.check(value):
+                return None, self.message
+        except (TypeError, ValueError, OverflowError):
+            return None, self.message
+
+        return value, None
+
+
+def _max_digits(limit):
+    return lambda value: len(str(int(abs(value)))) <= limit
+
+
+def _non_negative(value):
+    return value >= 0
+
+
+def _parse_datetime(value):
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.fromisoformat(value)
+    # A agenda usa horário local sem fuso
+    if value.tzinfo is not None:
+        raise ValueError('datetime com fuso horário')
+    return value
+
+
+# ============================================================
+#  SCHEMAS POR MODELO
+# ============================================================
+
+SCHEMAS = {
+    'Client': (
+        Rule('name', 'Nome é obrigatório e deve ter no máximo 100 caracteres.', max_length=100),
+        Rule('address', 'Endereço deve ter no máximo 200 caracteres.', required=False, max_length=200),
+        Rule('phone', 'Telefone deve ter no máximo 20 caracteres, apenas números e ( ) + -.',
+             required=False, max_length=20, pattern=PHONE_RE),
+        Rule('email', 'E-mail inválido.', required=False, max_length=100, pattern=EMAIL_RE),
+    ),
+    'Vehicle': (
+        Rule('make', 'Marca é obrigatória e deve ter no máximo 50 caracteres.', max_length=50),
+        Rule('model', 'Modelo é obrigatório e deve ter no máximo 50 caracteres.', max_length=50),
+        Rule('year', 'O campo Ano deve conter apenas números e ter no máximo 4 dígitos.',
+             pattern=YEAR_RE, coerce=int),
+        Rule('license_plate',
+             'O campo Placa deve ter no máximo 7 caracteres, contendo apenas letras maiúsculas e números.',
+             pattern=PLATE_RE),
+        Rule('client_id', 'Selecione um cliente válido.', coerce=int),
+    ),
+    'Service': (
+        Rule('description', 'Descrição deve ter no máximo 400 caracteres.', max_length=400),
+        Rule('cost', 'Custo deve ser numérico e ter no máximo 6 dígitos.',
+             coerce=float, check=_max_digits(6)),
+        Rule('vehicle_id', 'Selecione um veículo válido.', coerce=int),
+    ),
+    'Part': (
+        Rule('name', 'Nome é obrigatório e deve ter no máximo 100 caracteres.', max_length=100),
+        Rule('price', 'Preço deve ser numérico, positivo e ter no máximo 6 dígitos.',
+             coerce=float, check=lambda v: v >= 0 and _max_digits(6)(v)),
+        Rule('stock', 'Estoque deve ser um número inteiro maior ou igual a zero.',
+             coerce=int, check=_non_negative),
+    ),
+    'Appointment': (
+        Rule('vehicle_id', 'Selecione um veículo válido.', coerce=int),
+        Rule('bay_id', 'Selecione um box válido.', required=False, coerce=int),
+        Rule('starts_at', 'Data/hora de início inválida.', coerce=_parse_datetime),
+        Rule('duration_minutes', 'Duração deve ser entre 15 e 600 minutos.',
+             coerce=int, check=lambda v: 15 <= v <= 600),
+        Rule('description', 'Descrição deve ter no máximo 400 caracteres.', max_length=400),
+        Rule('estimated_cost', 'Custo estimado deve ser numérico e ter no máximo 6 dígitos.',
+             required=False, coerce=float, check=lambda v: v >= 0 and _max_digits(6)(v)),
+    ),
+}
+
+
+# ============================================================
+#  API DE VALIDAÇÃO
+# ============================================================
+
+def _run(rules, data):
+    clean = {}
+    errors = {}
+    for rule in rules:
+        value, error = rule.apply(data.get(rule.field))
+        if error is not None:
+            errors[rule.field] = error
+        else:
+            clean[rule.field] = value
+    return clean, errors
+
+
+def _schema(model_name):
+    if model_name not in SCHEMAS:
+        raise ValueError(f"Unknown model: {model_name}")
+    return SCHEMAS[model_name]
+
+
+def validate(model_name, data):
+    """
+    Valida um registro (dict ou request.form) contra o schema do modelo.
+    Retorna (dados_limpos, erros), onde erros é {campo: mensagem}.
+    Não abre sessão nem consulta o banco.
+    """
+    return _run(_schema(model_name), data)
+
+
+def validate_many(model_name, records):
+    """
+    Valida um lote de registros em uma única passada.
+    Retorna (validos, erros): validos é a lista de dados limpos e erros é
+    uma lista de {"index": i, "errors": {campo: mensagem}} para os
+    registros rejeitados.
+    """
+    rules = _schema(model_name)
+    valid = []
+    invalid = []
+    for index, data in enumerate(records):
+        clean, errors = _run(rules, data)
+        if errors:
+            invalid.append({"index": index, "errors": errors})
+        else:
+            valid.append(clean)
+    return valid, invalid
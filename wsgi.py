@@ -0,0 +1,9 @@
+"""
+Ponto de entrada WSGI para produção.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from app import app
+
+__all__ = ['app']